@@ -1,5 +1,7 @@
 from typing import Union, Optional, Callable, Any, TYPE_CHECKING
-import bmesh, bpy, mathutils, re, math, traceback
+import bmesh, bpy, mathutils, re, math, time, traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from mathutils import Vector
 from bpy.utils import register_class, unregister_class
 from .f3d_gbi import *
@@ -479,9 +481,10 @@ class F3DContext:
         self.lastMaterialIndex: bool = None
 
         self.vertexData: dict[str, list[F3DVert]] = {}  # c name : parsed data
+        self.vertexLoadParams: dict[str, int] = {}  # gsSPVertex count/start argument : evaluated value
         self.textureData: dict[str, bpy.types.Image] = {}  # c name : blender texture
 
-        self.tlutAppliedTextures: str = []  # c name
+        self.tlutAppliedTextures: set[bpy.types.Image] = set()  # image
         self.currentTextureName: str | None = None
         self.imagesDontApplyTlut: set[bpy.types.Image] = set()  # image
 
@@ -674,12 +677,18 @@ class F3DContext:
         # NOTE: The groupIndex here does NOT correspond to a vertex group, but to the name of the limb (c variable)
         return BufferVertex(F3DVert(position, uv, rgb, normal, alpha), bufferVert.groupIndex, bufferVert.materialIndex)
 
+    def evalVertexLoadParam(self, param):
+        # Most gsSPVertex commands reuse the same few count/start expressions, so avoid reparsing them.
+        if param not in self.vertexLoadParams:
+            self.vertexLoadParams[param] = math_eval(param, self.f3d)
+        return self.vertexLoadParams[param]
+
     def addVertices(self, num, start, vertexDataName, vertexDataOffset):
         vertexData = self.vertexData[vertexDataName]
 
         # TODO: material index not important?
-        count = math_eval(num, self.f3d)
-        start = math_eval(start, self.f3d)
+        count = self.evalVertexLoadParam(num)
+        start = self.evalVertexLoadParam(start)
 
         if start + count > len(self.vertexBuffer):
             raise PluginError(
@@ -696,8 +705,11 @@ class F3DContext:
                 f"{vertexDataName} is of size {len(vertexData)}, "
                 f"attemped read from ({vertexDataOffset}, {vertexDataOffset + count})"
             )
-        for i in range(count):
-            self.vertexBuffer[start + i] = BufferVertex(vertexData[vertexDataOffset + i], self.currentTransformName, 0)
+        transformName = self.currentTransformName
+        self.vertexBuffer[start : start + count] = [
+            BufferVertex(f3dVert, transformName, 0)
+            for f3dVert in vertexData[vertexDataOffset : vertexDataOffset + count]
+        ]
 
     def addTriangle(self, indices, dlData):
         if self.materialChanged:
@@ -772,7 +784,7 @@ class F3DContext:
         index: int,
     ):
         self.applyTLUT(texProp.tex, tlut)
-        self.tlutAppliedTextures.append(texProp.tex)
+        self.tlutAppliedTextures.add(texProp.tex)
 
     # we only want to apply tlut to an existing image under specific conditions.
     # however we always want to record the changing tlut for texture references.
@@ -2226,13 +2238,91 @@ def parseMacroArgs(data: str):
     return params
 
 
-def getImportData(filepaths):
-    data = ""
+class ImportDataCache:
+    """Least recently used cache of imported C file contents, bounded by the total length of the cached files."""
+
+    # Files modified this recently are not cached, as a same size edit within one timestamp tick would go unnoticed.
+    RECENT_MODIFICATION_NS = 2 * 10**9
+
+    def __init__(self, maxSize: int):
+        self.maxSize = maxSize
+        self.size = 0
+        self.entries: OrderedDict[str, tuple[tuple[int, int], str]] = OrderedDict()  # path : (file version, data)
+
+    def get(self, path: str, fileVersion: tuple[int, int]) -> Optional[str]:
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        if entry[0] != fileVersion:
+            self.remove(path)
+            return None
+        self.entries.move_to_end(path)
+        return entry[1]
+
+    def add(self, path: str, fileVersion: tuple[int, int], data: str):
+        self.remove(path)
+        if len(data) > self.maxSize or time.time_ns() - fileVersion[0] < ImportDataCache.RECENT_MODIFICATION_NS:
+            return
+        self.entries[path] = (fileVersion, data)
+        self.size += len(data)
+        while self.size > self.maxSize:
+            _, (_, evictedData) = self.entries.popitem(last=False)
+            self.size -= len(evictedData)
+
+    def remove(self, path: str):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+importDataCache = ImportDataCache(64 * 1024 * 1024)
+
+
+def clearImportDataCache():
+    importDataCache.clear()
+
+
+def getImportFileVersion(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def getImportFileData(filepaths) -> list[str]:
+    """Returns the contents of each existing file in filepaths, in order."""
+    # Importing several scenes/skeletons often reads the same asset files, so keep them until they change on disk.
+    # Only the file reads happen on worker threads, the cache is only accessed from the calling thread.
+    fileData: dict[str, str] = {}
+    pathsToRead: list[tuple[str, tuple[int, int]]] = []
     for path in filepaths:
-        if os.path.exists(path):
-            data += readFile(path)
+        if not os.path.exists(path):
+            continue
+        fileVersion = getImportFileVersion(path)
+        cachedData = importDataCache.get(path, fileVersion)
+        if cachedData is not None:
+            fileData[path] = cachedData
+        else:
+            pathsToRead.append((path, fileVersion))
 
-    return data
+    # file reads release the GIL, so overlap them when there are several files to read
+    if len(pathsToRead) > 4:
+        with ThreadPoolExecutor(max_workers=min(32, len(pathsToRead))) as executor:
+            readData = list(executor.map(readFile, [path for path, _ in pathsToRead]))
+    else:
+        readData = [readFile(path) for path, _ in pathsToRead]
+
+    for (path, fileVersion), data in zip(pathsToRead, readData):
+        importDataCache.add(path, fileVersion, data)
+        fileData[path] = data
+
+    return [fileData[path] for path in filepaths if path in fileData]
+
+
+def getImportData(filepaths):
+    return "".join(getImportFileData(filepaths))
 
 
 def parseMatrices(sceneData: str, f3dContext: F3DContext, importScale: float = 1):
@@ -2410,6 +2500,8 @@ def f3d_parser_unregister():
     for cls in reversed(f3d_parser_classes):
         unregister_class(cls)
 
+    clearImportDataCache()
+
     del bpy.types.Scene.DLImportName
     del bpy.types.Scene.DLImportPath
     del bpy.types.Scene.DLRemoveDoubles
@@ -3,7 +3,13 @@ from typing import Any, Callable, Optional
 from bpy.utils import register_class, unregister_class
 from bpy.app.handlers import persistent
 from .f3d_gbi import FImage
-from .f3d_material import all_combiner_uses, update_tex_values_manual, iter_tex_nodes, TextureProperty
+from .f3d_material import (
+    combiner_uses_tex0,
+    combiner_uses_tex1,
+    update_tex_values_manual,
+    iter_tex_nodes,
+    TextureProperty,
+)
 from ..utility import prop_split, CollectionProperty
 from dataclasses import dataclass
 import dataclasses
@@ -48,7 +54,11 @@ def usesFlipbook(
     checkFlipbookReference: Optional[Callable[[str], bool]],
 ) -> bool:
     texProp = getattr(material.f3d_mat, f"tex{index}")
-    if all_combiner_uses(material.f3d_mat)["Texture " + str(index)] and texProp.use_tex_reference:
+    # check the texture reference first, since it is much cheaper than checking combiner uses
+    if not texProp.use_tex_reference:
+        return False
+    combinerUsesTex = combiner_uses_tex0 if index == 0 else combiner_uses_tex1
+    if combinerUsesTex(material.f3d_mat):
         return (
             checkFlipbookReference is not None
             and checkFlipbookReference(texProp.tex_reference)
@@ -223,8 +233,11 @@ def drawFlipbookGroupProperty(
 
 
 # START GAME SPECIFIC CALLBACKS
+ootFlipbookReferenceRegex = re.compile(r"0x0([0-9A-F])000000")
+
+
 def ootFlipbookReferenceIsValid(texReference: str) -> bool:
-    return re.search(f"0x0([0-9A-F])000000", texReference) is not None
+    return ootFlipbookReferenceRegex.search(texReference) is not None
 
 
 def ootFlipbookRequirementMessage(layout: bpy.types.UILayout):
@@ -1,6 +1,6 @@
 import bpy, os, re, mathutils
 from typing import Union
-from ..f3d.f3d_parser import F3DContext, F3DTextureReference, getImportData
+from ..f3d.f3d_parser import F3DContext, F3DTextureReference, getImportData, getImportFileData
 from ..f3d.f3d_material import TextureProperty, createF3DMat, texFormatOf, texBitSizeF3D
 from ..utility import PluginError, CData, hexOrDecInt, getNameFromPath, getTextureSuffixFromFormat, toAlnum
 from ..f3d.flipbook import TextureFlipbook, FlipbookProperty, usesFlipbook, ootFlipbookReferenceIsValid
@@ -8,7 +8,6 @@ from ..f3d.flipbook import TextureFlipbook, FlipbookProperty, usesFlipbook, ootF
 from ..f3d.f3d_writer import VertexGroupInfo, TriangleConverterInfo
 from ..f3d.f3d_texture_writer import (
     getColorsUsedInImage,
-    mergePalettes,
     writeCITextureData,
     writeNonCITextureData,
     getTextureNamesFromImage,
@@ -30,41 +29,63 @@ from ..f3d.f3d_gbi import (
     DPSetTile,
 )
 
+# matches object asset headers, ex. #include "assets/objects/object_link_boy/object_link_boy.h"
+assetIncludeRegex = re.compile(r"\#include\s*\"(assets/objects/(.*?))\.h\"")
+# matches .c includes in the same directory, ex. #include "gLinkAdultSkel.c"
+sameDirIncludeRegex = re.compile(r"\#include\s*\"(((?![/\"]).)*)\.c\"")
+
+# matches segmented addresses used for texture arrays, ex. 0x08000000
+segmentedTextureRegex = re.compile(r"(0x0[0-9a-fA-F])000000")
+
+# VTX(x, y, z, s, t, r/nx, g/ny, b/nz, a) vertex macro, left uncompiled since the F3D parser applies its own flags
+vtxMacroPattern = r"VTX\s*\(([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*)\)"
+
+# (draw layer property, segment address) for dynamic material segments 0x08 - 0x0D
+ootMaterialSegments = tuple((f"segment{i:X}", f"0x{i:X}000000") for i in range(8, 14))
+# (draw layer property, segment property) for custom material calls
+ootMaterialCustomCalls = tuple((f"customCall{i}", f"customCall{i}_seg") for i in range(0, 2))
+
 
 # read included asset data
 def ootGetIncludedAssetData(basePath: str, currentPaths: list[str], data: str) -> str:
     includeData = ""
-    searchedPaths = currentPaths[:]
+    searchedPaths = set(currentPaths)
 
     print("Included paths:")
 
     # search assets
-    for includeMatch in re.finditer(r"\#include\s*\"(assets/objects/(.*?))\.h\"", data):
+    for includeMatch in assetIncludeRegex.finditer(data):
         path = os.path.join(basePath, includeMatch.group(1) + ".c")
         if path in searchedPaths:
             continue
-        searchedPaths.append(path)
+        searchedPaths.add(path)
         subIncludeData = getImportData([path]) + "\n"
         includeData += subIncludeData
         print(path)
 
-        for subIncludeMatch in re.finditer(r"\#include\s*\"(((?![/\"]).)*)\.c\"", subIncludeData):
+        # read all sub includes of this object file at once
+        subPaths = []
+        for subIncludeMatch in sameDirIncludeRegex.finditer(subIncludeData):
             subPath = os.path.join(os.path.dirname(path), subIncludeMatch.group(1) + ".c")
             if subPath in searchedPaths:
                 continue
-            searchedPaths.append(subPath)
+            searchedPaths.add(subPath)
+            subPaths.append(subPath)
             print(subPath)
-            includeData += getImportData([subPath]) + "\n"
+
+        # keep a newline after each file, so a file without a trailing newline doesn't run into the next one
+        includeData += "".join(subData + "\n" for subData in getImportFileData(subPaths))
 
     # search same directory c includes, both in current path and in included object files
     # these are usually fast64 exported files
-    for includeMatch in re.finditer(r"\#include\s*\"(((?![/\"]).)*)\.c\"", data):
+    for includeMatch in sameDirIncludeRegex.finditer(data):
         sameDirPaths = [
             os.path.join(os.path.dirname(currentPath), includeMatch.group(1) + ".c") for currentPath in currentPaths
         ]
         sameDirPathsToSearch = []
         for sameDirPath in sameDirPaths:
             if sameDirPath not in searchedPaths:
+                searchedPaths.add(sameDirPath)
                 sameDirPathsToSearch.append(sameDirPath)
 
         for sameDirPath in sameDirPathsToSearch:
@@ -98,6 +119,8 @@ class OOTModel(FModel):
     def __init__(self, name, DLFormat, drawLayerOverride):
         self.drawLayerOverride = drawLayerOverride
         self.flipbooks: list[TextureFlipbook] = []
+        self.flipbooksByName: dict[str, TextureFlipbook] = {}
+        self.imageColorsCache: dict[tuple[bpy.types.Image, str], list[int]] = {}  # {(image, ci format) : colors}
 
         FModel.__init__(self, name, DLFormat, GfxMatWriteMethod.WriteAll)
 
@@ -133,26 +156,36 @@ class OOTModel(FModel):
                 + "that repeated uses of this name use the same textures in the same order/format."
             )
 
-        for existingFlipbook in model.flipbooks:
-            if existingFlipbook.name == flipbook.name:
-                if len(existingFlipbook.textureNames) != len(flipbook.textureNames):
+        existingFlipbook = model.flipbooksByName.get(flipbook.name)
+        if existingFlipbook is None:
+            model.flipbooksByName[flipbook.name] = flipbook
+        elif existingFlipbook.textureNames != flipbook.textureNames:
+            if len(existingFlipbook.textureNames) != len(flipbook.textureNames):
+                raiseErr(
+                    f"of different lengths ({len(existingFlipbook.textureNames)} "
+                    + f"vs. {len(flipbook.textureNames)})"
+                )
+            for i in range(len(flipbook.textureNames)):
+                if existingFlipbook.textureNames[i] != flipbook.textureNames[i]:
                     raiseErr(
-                        f"of different lengths ({len(existingFlipbook.textureNames)} "
-                        + f"vs. {len(flipbook.textureNames)})"
+                        f"with differing elements (elem {i} = "
+                        + f"{existingFlipbook.textureNames[i]} vs. "
+                        + f"{flipbook.textureNames[i]})"
                     )
-                for i in range(len(flipbook.textureNames)):
-                    if existingFlipbook.textureNames[i] != flipbook.textureNames[i]:
-                        raiseErr(
-                            f"with differing elements (elem {i} = "
-                            + f"{existingFlipbook.textureNames[i]} vs. "
-                            + f"{flipbook.textureNames[i]})"
-                        )
         model.flipbooks.append(flipbook)
 
+    def getImageColors(self, image: bpy.types.Image, palFormat: str) -> list[int]:
+        # The same image is often used by multiple flipbooks (ex. LOD skeletons), so only scan its pixels once.
+        model = self.getFlipbookOwner()
+        key = (image, palFormat)
+        if key not in model.imageColorsCache:
+            model.imageColorsCache[key] = getColorsUsedInImage(image, palFormat)
+        return model.imageColorsCache[key]
+
     def validateImages(self, material: bpy.types.Material, index: int):
         flipbookProp = getattr(material.flipbookGroup, f"flipbook{index}")
         texProp = getattr(material.f3d_mat, f"tex{index}")
-        allImages = []
+        allImages: dict[bpy.types.Image, None] = {}  # used as an ordered set
         refSize = (texProp.tex_reference_size[0], texProp.tex_reference_size[1])
         for flipbookTexture in flipbookProp.textures:
             if flipbookTexture.image is None:
@@ -163,13 +196,26 @@ class OOTModel(FModel):
                     f"In {material.name}: texture reference size is {refSize}, "
                     + f"but flipbook image {flipbookTexture.image.filepath} size is {imSize}."
                 )
-            if flipbookTexture.image not in allImages:
-                allImages.append(flipbookTexture.image)
-        return allImages
+            allImages[flipbookTexture.image] = None
+        return list(allImages)
+
+    def createFlipbookImage(
+        self, flipbookProp, flipbookTexture, texFmt: str, imageFmt: str, imageBitSize: str
+    ) -> FImage:
+        imageName, filename = getTextureNamesFromImage(flipbookTexture.image, texFmt, self.getFlipbookOwner())
+        if flipbookProp.exportMode == "Individual":
+            imageName = flipbookTexture.name
+        return FImage(
+            imageName,
+            imageFmt,
+            imageBitSize,
+            flipbookTexture.image.size[0],
+            flipbookTexture.image.size[1],
+            filename,
+        )
 
     def processTexRefCITextures(self, fMaterial: FMaterial, material: bpy.types.Material, index: int) -> FImage:
         # print("Processing flipbook...")
-        model = self.getFlipbookOwner()
         flipbookProp = getattr(material.flipbookGroup, f"flipbook{index}")
         texProp = getattr(material.f3d_mat, f"tex{index}")
         if not usesFlipbook(material, flipbookProp, index, True, ootFlipbookReferenceIsValid):
@@ -179,32 +225,28 @@ class OOTModel(FModel):
 
         flipbook = TextureFlipbook(flipbookProp.name, flipbookProp.exportMode, [], [])
 
-        pal = []
+        texFmt = texProp.tex_format
+        ciFmt = texProp.ci_format
+        imageFmt = texFormatOf[texFmt]
+        imageBitSize = texBitSizeF3D[texFmt]
+
+        # ordered set of colors, merged the same way as mergePalettes but without rescanning the palette per frame
+        palColors: dict[int, None] = {}
         allImages = self.validateImages(material, index)
         for flipbookTexture in flipbookProp.textures:
             # print(f"Texture: {str(flipbookTexture.image)}")
-            imageName, filename = getTextureNamesFromImage(flipbookTexture.image, texProp.tex_format, model)
-            if flipbookProp.exportMode == "Individual":
-                imageName = flipbookTexture.name
-
             # We don't know yet if this already exists, cause we need the full set
             # of images which contribute to the palette, which we don't get until
             # writeTexRefCITextures (in case the other texture in multitexture contributes).
             # So these get created but may get dropped later.
-            fImage_temp = FImage(
-                imageName,
-                texFormatOf[texProp.tex_format],
-                texBitSizeF3D[texProp.tex_format],
-                flipbookTexture.image.size[0],
-                flipbookTexture.image.size[1],
-                filename,
-            )
+            fImage_temp = self.createFlipbookImage(flipbookProp, flipbookTexture, texFmt, imageFmt, imageBitSize)
 
-            pal = mergePalettes(pal, getColorsUsedInImage(flipbookTexture.image, texProp.ci_format))
+            palColors.update(dict.fromkeys(self.getImageColors(flipbookTexture.image, ciFmt)))
 
             flipbook.textureNames.append(fImage_temp.name)
             flipbook.images.append((flipbookTexture.image, fImage_temp))
 
+        pal = list(palColors)
         # print(f"Palette length: {len(pal)}") # Checked in moreSetupFromModel
         return allImages, flipbook, pal
 
@@ -243,26 +285,21 @@ class OOTModel(FModel):
         if len(flipbookProp.textures) == 0:
             raise PluginError(f"{str(material)} cannot have a flipbook material with no flipbook textures.")
 
+        texFmt = texProp.tex_format
+        ciFmt = texProp.ci_format
+        imageFmt = texFormatOf[texFmt]
+        imageBitSize = texBitSizeF3D[texFmt]
+
         flipbook = TextureFlipbook(flipbookProp.name, flipbookProp.exportMode, [], [])
         allImages = self.validateImages(material, index)
         for flipbookTexture in flipbookProp.textures:
             # print(f"Texture: {str(flipbookTexture.image)}")
             # Can't use saveOrGetTextureDefinition because the way it gets the
             # image key and the name from the texture property won't work here.
-            imageKey = FImageKey(flipbookTexture.image, texProp.tex_format, texProp.ci_format, [flipbookTexture.image])
+            imageKey = FImageKey(flipbookTexture.image, texFmt, ciFmt, [flipbookTexture.image])
             fImage = model.getTextureAndHandleShared(imageKey)
             if fImage is None:
-                imageName, filename = getTextureNamesFromImage(flipbookTexture.image, texProp.tex_format, model)
-                if flipbookProp.exportMode == "Individual":
-                    imageName = flipbookTexture.name
-                fImage = FImage(
-                    imageName,
-                    texFormatOf[texProp.tex_format],
-                    texBitSizeF3D[texProp.tex_format],
-                    flipbookTexture.image.size[0],
-                    flipbookTexture.image.size[1],
-                    filename,
-                )
+                fImage = self.createFlipbookImage(flipbookProp, flipbookTexture, texFmt, imageFmt, imageBitSize)
                 model.addTexture(imageKey, fImage, fMaterial)
 
             flipbook.textureNames.append(fImage.name)
@@ -282,17 +319,16 @@ class OOTModel(FModel):
         # handle dynamic material calls
         gfxList = fMaterial.material
         matDrawLayer = getattr(material.ootMaterial, drawLayer.lower())
-        for i in range(8, 14):
-            if getattr(matDrawLayer, "segment" + format(i, "X")):
-                gfxList.commands.append(
-                    SPDisplayList(GfxList("0x" + format(i, "X") + "000000", GfxListTag.Material, DLFormat.Static))
-                )
-        for i in range(0, 2):
-            p = "customCall" + str(i)
-            if getattr(matDrawLayer, p):
-                gfxList.commands.append(
-                    SPDisplayList(GfxList(getattr(matDrawLayer, p + "_seg"), GfxListTag.Material, DLFormat.Static))
+        dynamicCommands = []
+        for segmentProp, segmentAddr in ootMaterialSegments:
+            if getattr(matDrawLayer, segmentProp):
+                dynamicCommands.append(SPDisplayList(GfxList(segmentAddr, GfxListTag.Material, DLFormat.Static)))
+        for callProp, callSegProp in ootMaterialCustomCalls:
+            if getattr(matDrawLayer, callProp):
+                dynamicCommands.append(
+                    SPDisplayList(GfxList(getattr(matDrawLayer, callSegProp), GfxListTag.Material, DLFormat.Static))
                 )
+        gfxList.commands.extend(dynamicCommands)
 
     def onAddMesh(self, fMesh, contextObj):
         if contextObj is not None and hasattr(contextObj, "ootDynamicTransform"):
@@ -326,8 +362,12 @@ class OOTVertexGroupInfo(VertexGroupInfo):
 
 
 class OOTF3DContext(F3DContext):
+    # shared by every unprocessed 0x0D matrix, frozen so that no user can modify it in place
+    identityMatrix = mathutils.Matrix.Identity(4).freeze()
+
     def __init__(self, f3d, limbList, basePath):
         self.limbList = limbList
+        self.boneNames = [f"bone{index:03}_{limbName}" for index, limbName in enumerate(limbList)]
         self.dlList = []  # in the order they are rendered
         self.isBillboard = False
         self.flipbooks = {}  # {(segment, draw layer) : TextureFlipbook}
@@ -340,12 +380,12 @@ class OOTF3DContext(F3DContext):
         return self.limbList[index]
 
     def getBoneName(self, index):
-        return "bone" + format(index, "03") + "_" + self.getLimbName(index)
+        return self.boneNames[index]
 
     def vertexFormatPatterns(self, data):
         # position, uv, color/normal
         if "VTX" in data:
-            return ["VTX\s*\(([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*)\)"]
+            return [vtxMacroPattern]
         else:
             return F3DContext.vertexFormatPatterns(self, data)
 
@@ -360,7 +400,7 @@ class OOTF3DContext(F3DContext):
             # This code is for jabu jabu level, requires not adding to self.dlList?
             else:
                 transformName = name
-                self.matrixData[name] = mathutils.Matrix.Identity(4)
+                self.matrixData[name] = OOTF3DContext.identityMatrix
                 print(f"Matrix {name} has not been processed from dlList, substituting identity matrix.")
 
             F3DContext.setCurrentTransform(self, transformName, flagList)
@@ -378,11 +418,14 @@ class OOTF3DContext(F3DContext):
 
     def processDLName(self, name):
         # Commands loaded to 0x0C are material related only.
+        # C symbols can't start with a digit, so only numeric names are parsed as pointers.
+        if not name[:1].isdigit():
+            if name == "gEmptyDL":
+                return None
+            return name
         try:
             pointer = hexOrDecInt(name)
         except:
-            if name == "gEmptyDL":
-                return None
             return name
         else:
             segment = pointer >> 24
@@ -391,17 +434,9 @@ class OOTF3DContext(F3DContext):
                 setattr(self.materialContext.ootMaterial.transparent, "segment" + format(segment, "1X"), True)
                 self.materialChanged = True
             return None
-        return name
 
     def processTextureName(self, textureName):
-        try:
-            pointer = hexOrDecInt(textureName)
-        except:
-            return textureName
-        else:
-            return textureName
-            # if (pointer >> 24) == 0x08:
-            # 	print("Unhandled OOT pointer: " + textureName)
+        return textureName
 
     def getMaterialKey(self, material: bpy.types.Material):
         return (material.ootMaterial.key(), super().getMaterialKey(material))
@@ -433,7 +468,8 @@ class OOTF3DContext(F3DContext):
     ):
         # check for texture arrays.
         clearOOTFlipbookProperty(getattr(material.flipbookGroup, "flipbook" + str(index)))
-        match = re.search(f"(0x0[0-9a-fA-F])000000", name)
+        # most references are texture names, which don't need the regex
+        match = segmentedTextureRegex.search(name) if "0x0" in name else None
         if match:
             segment = int(match.group(1), 16)
             flipbookKey = (segment, material.f3d_mat.draw_layer.oot)
@@ -450,19 +486,25 @@ class OOTF3DContext(F3DContext):
                     raise PluginError(
                         f'Texture array "{flipbookProp.name}" pointed at segment {hex(segment)} is a zero element array, which is invalid.'
                     )
-                for textureName in flipbook.textureNames:
-                    image = self.loadTexture(data, textureName, None, tileSettings, False)
+                # load every texture before touching the collection, so a missing texture leaves it empty
+                images = [
+                    self.loadTexture(data, textureName, None, tileSettings, False)
+                    for textureName in flipbook.textureNames
+                ]
+                for textureName, image in zip(flipbook.textureNames, images):
                     if not isinstance(image, bpy.types.Image):
                         raise PluginError(
                             f'Could not find texture "{textureName}", so it can not be used in a flipbook texture.\n'
                             f"For OOT scenes this may be because the scene's draw config references textures not stored in its scene/room files.\n"
                             f"In this case, draw configs that use flipbook textures should only be used for one scene.\n"
                         )
-                    flipbookProp.textures.add()
-                    flipbookProp.textures[-1].image = image
+
+                for textureName, image in zip(flipbook.textureNames, images):
+                    flipbookTexture = flipbookProp.textures.add()
+                    flipbookTexture.image = image
 
                     if flipbookProp.exportMode == "Individual":
-                        flipbookProp.textures[-1].name = textureName
+                        flipbookTexture.name = textureName
 
                 texProp = getattr(material.f3d_mat, "tex" + str(index))
                 texProp.tex = flipbookProp.textures[0].image  # for visual purposes only, will be ignored
@@ -492,7 +534,7 @@ class OOTF3DContext(F3DContext):
             for flipbookTexture in flipbook.textures:
                 if flipbookTexture.image not in self.tlutAppliedTextures:
                     self.applyTLUT(flipbookTexture.image, tlut)
-                    self.tlutAppliedTextures.append(flipbookTexture.image)
+                    self.tlutAppliedTextures.add(flipbookTexture.image)
         else:
             super().handleApplyTLUT(material, texProp, tlut, index)
 